@@ -1,16 +1,118 @@
 import json
+import time
+import gzip
+import base64
+import random
 import boto3
+from boto3.dynamodb.conditions import Key
 from datetime import datetime, timedelta
 from decimal import Decimal
+from collections import OrderedDict, defaultdict, Counter
+
+try:
+    import orjson  # Optional (Lambda layer): much faster JSON encoding
+except ImportError:
+    orjson = None
 
 dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
 table = dynamodb.Table('CostGuardianResourceLogs')
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
+# Per-day rollups written by the data exporter: PK Date (YYYY-MM-DD)
+DAILY_AGGREGATES_TABLE = 'CostGuardianDailyAggregates'
+
+# GSI on CostGuardianResourceLogs: partition key Status (S), sort key Timestamp (N)
+STATUS_TIMESTAMP_INDEX = 'StatusTimestampIndex'
+
+# Retries for UnprocessedKeys from batch_get_item (exponential backoff with jitter)
+BATCH_GET_MAX_RETRIES = 5
+BATCH_GET_BASE_DELAY = 0.05  # Seconds; doubles per retry
+
+# ResourceType -> attribute holding the resource's display name (as logged by the monitor Lambda)
+_NAME_KEY = {
+    'EC2': 'InstanceName',
+    'EBS_VOLUME': 'VolumeName',
+    'LOAD_BALANCER': 'LoadBalancerName',
+    'VPC': 'VpcName'
+}
+
+# Aggregated results cached across warm invocations: (view, date) -> (expires_at, data)
+_CACHE: "OrderedDict[tuple, tuple[float, dict]]" = OrderedDict()
+_CACHE_MAX = 128
+CACHE_TTL_HISTORICAL = 86400  # Past periods no longer change
+CACHE_TTL_CURRENT = 300       # Current week / current month
+CACHE_TTL_TODAY = 60          # Daily view for today (most requested, still changing)
+
+
+def _decimal_default(obj):
+    """Helper to encode Decimal objects from DynamoDB"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json_bytes(data):
+    """Serialize to compact UTF-8 JSON bytes with orjson when available, else the json module"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_decimal_default)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=_decimal_default).encode('utf-8')
+
+
+# Gzip responses are returned base64-encoded with isBase64Encoded=true. On a REST API,
+# API Gateway only decodes them if binaryMediaTypes is configured (e.g. "*/*");
+# HTTP APIs decode them without extra configuration.
+def accepts_gzip(event):
+    """True if the request's Accept-Encoding header allows gzip"""
+    headers = event.get('headers') or {}
+    for name, value in headers.items():
+        if name.lower() == 'accept-encoding' and value and 'gzip' in value.lower():
+            return True
+    return False
+
+
+def cached(key, ttl, fn):
+    """
+    Return the cached result for key if it has not expired, otherwise call fn()
+    and cache its result for ttl seconds (least recently used evicted first)
+    Nothing is cached if fn() raises
+    The expiry is fixed when the entry is stored, so a result cached while its
+    period was still in progress keeps its short TTL after the period ends
+    """
+    
+    now = time.monotonic()
+    entry = _CACHE.get(key)
+    
+    if entry is not None and now < entry[0]:
+        _CACHE.move_to_end(key)
+        return entry[1]
+    
+    data = fn()
+    _CACHE[key] = (now + ttl, data)
+    _CACHE.move_to_end(key)
+    
+    while len(_CACHE) > _CACHE_MAX:
+        _CACHE.popitem(last=False)
+    
+    return data
+
+
+def get_cache_ttl(view, target_date):
+    """Short TTL while the requested period is still in progress, long TTL once it has ended"""
+    
+    today = datetime.now().date()
+    day = target_date.date()
+    
+    if view == 'weekly':
+        period_end = day + timedelta(days=6 - day.weekday())
+    elif view == 'monthly':
+        period_end = (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    else:
+        period_end = day
+    
+    if period_end < today:
+        return CACHE_TTL_HISTORICAL
+    
+    return CACHE_TTL_TODAY if view == 'daily' else CACHE_TTL_CURRENT
+
 
 def lambda_handler(event, context):
     """
@@ -31,9 +133,35 @@ def lambda_handler(event, context):
     except:
         target_date = datetime.now()
     
+    fetchers = {
+        'daily': get_daily_deleted_resources,
+        'weekly': get_weekly_resource_counts,
+        'monthly': get_monthly_resource_counts
+    }
+    
+    if view not in fetchers:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Invalid view parameter'})
+        }
+    
+    cache_key = (view, target_date.strftime('%Y-%m-%d'))
+    cache_ttl = get_cache_ttl(view, target_date)
+    
+    try:
+        data = cached(cache_key, cache_ttl, lambda: fetchers[view](target_date))
+    except Exception:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Failed to load dashboard data'})
+        }
+    
     if view == 'daily':
         # DAILY VIEW: Return list of all deleted resources
-        data = get_daily_deleted_resources(target_date)
         response_body = {
             'view': 'daily',
             'date': target_date.strftime('%Y-%m-%d'),
@@ -43,7 +171,6 @@ def lambda_handler(event, context):
     
     elif view == 'weekly':
         # WEEKLY VIEW: Return counts by category for the week
-        data = get_weekly_resource_counts(target_date)
         response_body = {
             'view': 'weekly',
             'week_start': data['week_start'],
@@ -53,9 +180,8 @@ def lambda_handler(event, context):
             'summary': data['summary']
         }
     
-    elif view == 'monthly':
+    else:
         # MONTHLY VIEW: Return counts by category for the month
-        data = get_monthly_resource_counts(target_date)
         response_body = {
             'view': 'monthly',
             'month': target_date.strftime('%Y-%m'),
@@ -64,22 +190,99 @@ def lambda_handler(event, context):
             'summary': data['summary']
         }
     
-    else:
+    raw_body = dumps_json_bytes(response_body)
+    
+    # Return a pre-compressed body when the client supports it (API Gateway passes it through)
+    if accepts_gzip(event):
         return {
-            'statusCode': 400,
-            'body': json.dumps({'error': 'Invalid view parameter'})
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Content-Encoding': 'gzip',
+                'Vary': 'Accept-Encoding',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': base64.b64encode(gzip.compress(raw_body, compresslevel=6)).decode('ascii'),
+            'isBase64Encoded': True
         }
     
     return {
         'statusCode': 200,
         'headers': {
             'Content-Type': 'application/json',
+            'Vary': 'Accept-Encoding',
             'Access-Control-Allow-Origin': '*'
         },
-        'body': json.dumps(response_body, cls=DecimalEncoder)
+        'body': raw_body.decode('utf-8')
     }
 
 
+def query_deleted_items(start_timestamp, end_timestamp, projection=None, attribute_names=None):
+    """
+    Query the Status/Timestamp GSI for DELETED entries in a time range
+    Follows LastEvaluatedKey so every page is returned
+    Optional projection/attribute_names limit the attributes read
+    """
+    
+    query_kwargs = {
+        'IndexName': STATUS_TIMESTAMP_INDEX,
+        'KeyConditionExpression': Key('Status').eq('DELETED') & Key('Timestamp').between(start_timestamp, end_timestamp),
+        'ConsistentRead': False  # GSIs are eventually consistent; freshness comes from the cache TTL
+    }
+    
+    if projection:
+        query_kwargs['ProjectionExpression'] = projection
+    if attribute_names:
+        query_kwargs['ExpressionAttributeNames'] = attribute_names
+    
+    response = table.query(**query_kwargs)
+    items = response.get('Items', [])
+    
+    # Handle pagination if needed
+    while 'LastEvaluatedKey' in response:
+        response = table.query(ExclusiveStartKey=response['LastEvaluatedKey'], **query_kwargs)
+        items.extend(response.get('Items', []))
+    
+    return items
+
+
+def get_daily_aggregates(days):
+    """
+    Batch-get the daily rollups for the given days
+    Returns {date_str: {resource_type: {count, monthly_savings}}}, missing days omitted
+    Raises if keys are still unprocessed after BATCH_GET_MAX_RETRIES retries
+    """
+    
+    request_items = {
+        DAILY_AGGREGATES_TABLE: {
+            'Keys': [{'Date': day.strftime('%Y-%m-%d')} for day in days],
+            'ProjectionExpression': '#date, Categories',
+            'ExpressionAttributeNames': {'#date': 'Date'},
+            'ConsistentRead': False  # Half the RCU of strongly consistent reads
+        }
+    }
+    
+    rollups = {}
+    attempt = 0
+    
+    # Retry any keys DynamoDB could not process in one call (throttling), backing off each time
+    while request_items:
+        response = dynamodb.batch_get_item(RequestItems=request_items)
+        
+        for item in response.get('Responses', {}).get(DAILY_AGGREGATES_TABLE, []):
+            rollups[item['Date']] = item.get('Categories', {})
+        
+        request_items = response.get('UnprocessedKeys')
+        
+        if request_items:
+            if attempt >= BATCH_GET_MAX_RETRIES:
+                raise RuntimeError(f"Daily aggregates still unprocessed after {attempt} retries")
+            time.sleep(BATCH_GET_BASE_DELAY * (2 ** attempt) * (0.5 + random.random()))
+            attempt += 1
+    
+    return rollups
+
+
 def get_daily_deleted_resources(target_date):
     """
     Get all resources deleted on a specific day
@@ -90,37 +293,33 @@ def get_daily_deleted_resources(target_date):
     start_of_day = int(datetime(target_date.year, target_date.month, target_date.day, 0, 0, 0).timestamp())
     end_of_day = int(datetime(target_date.year, target_date.month, target_date.day, 23, 59, 59).timestamp())
     
-    # Scan DynamoDB for deleted resources
+    # Query DynamoDB for deleted resources
     resources = []
-    total_monthly_savings = 0
-    category_counts = {}
     
     try:
-        response = table.scan(
-            FilterExpression='#status = :deleted AND #ts BETWEEN :start AND :end',
-            ExpressionAttributeNames={
-                '#status': 'Status',
-                '#ts': 'Timestamp'
-            },
-            ExpressionAttributeValues={
-                ':deleted': 'DELETED',
-                ':start': start_of_day,
-                ':end': end_of_day
-            }
+        items = query_deleted_items(
+            start_of_day,
+            end_of_day,
+            projection='ResourceType, ResourceId, InstanceName, VolumeName, LoadBalancerName, VpcName, EstimatedMonthlySavings, #ts',
+            attribute_names={'#ts': 'Timestamp'}
         )
         
-        items = response.get('Items', [])
+        # Bind hot-loop callables to locals (avoids repeated global/attribute lookups)
+        _append = resources.append
+        _fromts = datetime.fromtimestamp
+        _get = dict.get
+        _name_key = _NAME_KEY.get
         
         # Process each deleted resource
         for item in items:
-            resource_type = item.get('ResourceType', 'Unknown')
-            resource_id = item.get('ResourceId', 'N/A')
-            resource_name = item.get('InstanceName') or item.get('VolumeName') or item.get('LoadBalancerName') or item.get('VpcName') or 'Unnamed'
-            monthly_savings = float(item.get('EstimatedMonthlySavings', 0))
-            deleted_date = datetime.fromtimestamp(float(item.get('Timestamp', 0)))
+            resource_type = _get(item, 'ResourceType', 'Unknown')
+            resource_id = _get(item, 'ResourceId', 'N/A')
+            resource_name = _get(item, _name_key(resource_type, '')) or 'Unnamed'
+            monthly_savings = float(_get(item, 'EstimatedMonthlySavings', 0))
+            deleted_date = _fromts(float(_get(item, 'Timestamp', 0)))
             
             # Add to list
-            resources.append({
+            _append({
                 'resource_type': resource_type,
                 'resource_id': resource_id,
                 'resource_name': resource_name,
@@ -129,17 +328,15 @@ def get_daily_deleted_resources(target_date):
                 'deleted_at': deleted_date.isoformat(),
                 'deleted_date_readable': deleted_date.strftime('%Y-%m-%d %H:%M:%S')
             })
-            
-            # Update totals
-            total_monthly_savings += monthly_savings
-            
-            # Update category counts
-            if resource_type not in category_counts:
-                category_counts[resource_type] = 0
-            category_counts[resource_type] += 1
     
     except Exception as e:
+        # Re-raise so the handler returns an error and the empty result is not cached
         print(f"Error querying DynamoDB: {str(e)}")
+        raise
+    
+    # Totals and category counts
+    total_monthly_savings = sum(r['monthly_savings'] for r in resources)
+    category_counts = Counter(r['resource_type'] for r in resources)
     
     # Sort by monthly savings (highest first)
     resources.sort(key=lambda x: x['monthly_savings'], reverse=True)
@@ -150,7 +347,7 @@ def get_daily_deleted_resources(target_date):
             'total_resources_deleted': len(resources),
             'total_monthly_savings': total_monthly_savings,
             'total_annual_savings': total_monthly_savings * 12,
-            'categories': category_counts
+            'categories': dict(category_counts)
         }
     }
 
@@ -166,74 +363,53 @@ def get_weekly_resource_counts(target_date):
     week_start = datetime(week_start.year, week_start.month, week_start.day, 0, 0, 0)
     week_end = week_start + timedelta(days=6, hours=23, minutes=59, seconds=59)
     
-    start_timestamp = int(week_start.timestamp())
-    end_timestamp = int(week_end.timestamp())
+    week_days = [week_start + timedelta(days=i) for i in range(7)]
     
-    # Query DynamoDB
-    categories = {}
-    daily_breakdown = {i: {} for i in range(7)}  # Monday=0, Sunday=6
+    # Read the pre-aggregated daily rollups
+    categories = defaultdict(lambda: {'count': 0, 'monthly_savings': 0})
+    daily_breakdown = {i: Counter() for i in range(7)}  # Monday=0, Sunday=6
     total_monthly_savings = 0
     
     try:
-        response = table.scan(
-            FilterExpression='#status = :deleted AND #ts BETWEEN :start AND :end',
-            ExpressionAttributeNames={
-                '#status': 'Status',
-                '#ts': 'Timestamp'
-            },
-            ExpressionAttributeValues={
-                ':deleted': 'DELETED',
-                ':start': start_timestamp,
-                ':end': end_timestamp
-            }
-        )
-        
-        items = response.get('Items', [])
+        rollups = get_daily_aggregates(week_days)
         
-        for item in items:
-            resource_type = item.get('ResourceType', 'Unknown')
-            timestamp = float(item.get('Timestamp', 0))
-            monthly_savings = float(item.get('EstimatedMonthlySavings', 0))
-            
-            # Update category counts
-            if resource_type not in categories:
-                categories[resource_type] = {
-                    'count': 0,
-                    'monthly_savings': 0
-                }
-            
-            categories[resource_type]['count'] += 1
-            categories[resource_type]['monthly_savings'] += monthly_savings
-            
-            total_monthly_savings += monthly_savings
+        for day_of_week, day_date in enumerate(week_days):
+            day_categories = rollups.get(day_date.strftime('%Y-%m-%d'), {})
             
-            # Update daily breakdown
-            deleted_date = datetime.fromtimestamp(timestamp)
-            day_of_week = deleted_date.weekday()
-            
-            if resource_type not in daily_breakdown[day_of_week]:
-                daily_breakdown[day_of_week][resource_type] = 0
-            daily_breakdown[day_of_week][resource_type] += 1
+            for resource_type, stats in day_categories.items():
+                count = int(stats.get('count', 0))
+                monthly_savings = float(stats.get('monthly_savings', 0))
+                
+                # Update category counts
+                categories[resource_type]['count'] += count
+                categories[resource_type]['monthly_savings'] += monthly_savings
+                
+                total_monthly_savings += monthly_savings
+                
+                # Update daily breakdown
+                daily_breakdown[day_of_week][resource_type] += count
     
     except Exception as e:
+        # Re-raise so the handler returns an error and the empty result is not cached
         print(f"Error querying DynamoDB: {str(e)}")
+        raise
     
     # Format daily breakdown
     daily_formatted = []
     day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
     
     for day_index in range(7):
-        day_date = week_start + timedelta(days=day_index)
+        day_date = week_days[day_index]
         daily_formatted.append({
             'day': day_names[day_index],
             'date': day_date.strftime('%Y-%m-%d'),
-            'categories': daily_breakdown[day_index]
+            'categories': dict(daily_breakdown[day_index])
         })
     
     return {
         'week_start': week_start.strftime('%Y-%m-%d'),
         'week_end': week_end.strftime('%Y-%m-%d'),
-        'categories': categories,
+        'categories': dict(categories),
         'daily_breakdown': daily_formatted,
         'summary': {
             'total_resources_deleted': sum(cat['count'] for cat in categories.values()),
@@ -260,29 +436,15 @@ def get_monthly_resource_counts(target_date):
     
     month_end = next_month - timedelta(seconds=1)
     
-    start_timestamp = int(month_start.timestamp())
-    end_timestamp = int(month_end.timestamp())
+    month_days = [month_start + timedelta(days=i) for i in range(month_end.day)]
     
-    # Query DynamoDB
-    categories = {}
+    # Read the pre-aggregated daily rollups
+    categories = defaultdict(lambda: {'count': 0, 'monthly_savings': 0})
     weekly_breakdown = []
     total_monthly_savings = 0
     
     try:
-        response = table.scan(
-            FilterExpression='#status = :deleted AND #ts BETWEEN :start AND :end',
-            ExpressionAttributeNames={
-                '#status': 'Status',
-                '#ts': 'Timestamp'
-            },
-            ExpressionAttributeValues={
-                ':deleted': 'DELETED',
-                ':start': start_timestamp,
-                ':end': end_timestamp
-            }
-        )
-        
-        items = response.get('Items', [])
+        rollups = get_daily_aggregates(month_days)
         
         # Calculate weeks in month
         current_week_start = month_start
@@ -294,36 +456,29 @@ def get_monthly_resource_counts(target_date):
             week_data[week_key] = {
                 'start': current_week_start,
                 'end': current_week_end,
-                'categories': {}
+                'categories': Counter()
             }
             current_week_start += timedelta(days=7)
         
-        # Process items
-        for item in items:
-            resource_type = item.get('ResourceType', 'Unknown')
-            timestamp = float(item.get('Timestamp', 0))
-            monthly_savings = float(item.get('EstimatedMonthlySavings', 0))
-            
-            # Update category counts
-            if resource_type not in categories:
-                categories[resource_type] = {
-                    'count': 0,
-                    'monthly_savings': 0
-                }
-            
-            categories[resource_type]['count'] += 1
-            categories[resource_type]['monthly_savings'] += monthly_savings
-            
-            total_monthly_savings += monthly_savings
-            
-            # Update weekly breakdown
-            deleted_date = datetime.fromtimestamp(timestamp)
-            week_key = deleted_date.strftime('%Y-W%U')
+        week_keys = list(week_data)
+        
+        # Process daily rollups
+        for day_index, day_date in enumerate(month_days):
+            day_categories = rollups.get(day_date.strftime('%Y-%m-%d'), {})
+            week_categories = week_data[week_keys[day_index // 7]]['categories']
             
-            if week_key in week_data:
-                if resource_type not in week_data[week_key]['categories']:
-                    week_data[week_key]['categories'][resource_type] = 0
-                week_data[week_key]['categories'][resource_type] += 1
+            for resource_type, stats in day_categories.items():
+                count = int(stats.get('count', 0))
+                monthly_savings = float(stats.get('monthly_savings', 0))
+                
+                # Update category counts
+                categories[resource_type]['count'] += count
+                categories[resource_type]['monthly_savings'] += monthly_savings
+                
+                total_monthly_savings += monthly_savings
+                
+                # Update weekly breakdown
+                week_categories[resource_type] += count
         
         # Format weekly breakdown
         for week_key, week_info in sorted(week_data.items()):
@@ -331,19 +486,21 @@ def get_monthly_resource_counts(target_date):
                 'week': week_key,
                 'start_date': week_info['start'].strftime('%Y-%m-%d'),
                 'end_date': week_info['end'].strftime('%Y-%m-%d'),
-                'categories': week_info['categories']
+                'categories': dict(week_info['categories'])
             })
     
     except Exception as e:
+        # Re-raise so the handler returns an error and the empty result is not cached
         print(f"Error querying DynamoDB: {str(e)}")
+        raise
     
     return {
         'month': target_date.strftime('%Y-%m'),
-        'categories': categories,
+        'categories': dict(categories),
         'weekly_breakdown': weekly_breakdown,
         'summary': {
             'total_resources_deleted': sum(cat['count'] for cat in categories.values()),
             'total_monthly_savings': total_monthly_savings,
             'total_annual_savings': total_monthly_savings * 12
         }
-    }
\ No newline at end of file
+    }
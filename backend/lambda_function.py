@@ -3,25 +3,44 @@
 # ============================================
 # Function Name: CostGuardian-DataExporter
 # Trigger: DynamoDB Stream on CostGuardianResourceLogs
+#          (event source mapping: BatchSize=1000, MaximumBatchingWindowInSeconds=30)
 # Purpose: Export dashboard data to GitHub for static website
 # Runtime: Python 3.12
 # Memory: 256 MB
 # Timeout: 60 seconds
 # Dependencies: NONE (uses only boto3 which is built-in)
+#               orjson is used for encoding if provided by a layer
 # ============================================
 
 import json
 import boto3
 import os
-from datetime import datetime, timedelta
+import time
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 import base64
-import urllib.request
-import urllib.error
+import hashlib
+import urllib3
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+
+try:
+    import orjson  # Optional (Lambda layer): much faster JSON encoding
+except ImportError:
+    orjson = None
 
 # Initialize AWS clients
 dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-s3_client = boto3.client('s3', region_name='us-east-1')
+cloudwatch = boto3.client('cloudwatch', region_name='us-east-1')
+
+# Pooled HTTPS client for the GitHub API (connections/TLS sessions reused across warm invocations)
+# urllib3 ships with botocore in the Lambda runtime
+_HTTP = urllib3.PoolManager(
+    num_pools=1,
+    maxsize=4,
+    retries=urllib3.Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504], raise_on_status=False)
+)
 
 # Configuration from environment variables
 DYNAMODB_TABLE = os.environ.get('DYNAMODB_TABLE', 'CostGuardianResourceLogs')
@@ -29,6 +48,25 @@ GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')  # GitHub Personal Access Token
 GITHUB_REPO = os.environ.get('GITHUB_REPO')    # e.g., "username/costguardian-dashboard"
 GITHUB_BRANCH = os.environ.get('GITHUB_BRANCH', 'main')
 DATA_FILE_PATH = os.environ.get('DATA_FILE_PATH', 'public/data.json')
+DAILY_AGGREGATES_TABLE = os.environ.get('DAILY_AGGREGATES_TABLE', 'CostGuardianDailyAggregates')
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '8'))  # Parallel scan segments (threads)
+EXPORT_LEASE_TABLE = os.environ.get('EXPORT_LEASE_TABLE', 'CostGuardianExportLease')  # PK LeaseId, TTL on ExpiresAt
+EXPORT_LEASE_SECONDS = int(os.environ.get('EXPORT_LEASE_SECONDS', '60'))  # Lease expiry (frees it if an export crashes)
+MAX_TRAILING_EXPORTS = int(os.environ.get('MAX_TRAILING_EXPORTS', '3'))  # Re-exports per invocation for writes that arrived mid-export
+TRAILING_EXPORT_MIN_REMAINING_MS = int(os.environ.get('TRAILING_EXPORT_MIN_REMAINING_MS', '20000'))  # Time needed to start one
+
+# Table handles (created once per container)
+# The parallel scan calls the resource's client (dynamodb.meta.client) instead: clients are
+# thread-safe, resource objects are not. It still returns plain Python values (str, Decimal)
+_AGGREGATES_TABLE = dynamodb.Table(DAILY_AGGREGATES_TABLE)
+_LEASE_TABLE = dynamodb.Table(EXPORT_LEASE_TABLE)
+
+# Resource status -> dashboard bucket
+_DELETED = frozenset(('Deleted', 'Released', 'Terminated'))
+_IDLE = frozenset(('Idle-Warning', 'Idle', 'Quarantine', 'Stopped', 'Available', 'Unattached', 'Empty'))
+_WARNED = frozenset(('Idle-Warning', 'Idle', 'Quarantine'))  # Activity timeline "warned"
+_STATUS_BUCKET = {s: 'deleted' for s in _DELETED} | {s: 'idle' for s in _IDLE} | {'Active': 'active'}
+
 
 def lambda_handler(event, context):
     """
@@ -40,18 +78,33 @@ def lambda_handler(event, context):
     print("🚀 DATA EXPORT LAMBDA STARTED")
     print("="*60)
     
+    # Only one export runs at a time. Invocations arriving meanwhile mark the lease dirty
+    # and return; the running export then re-exports once more before releasing it
+    if not acquire_export_lease():
+        print("\n⏭️  Export already in progress - marked for re-export (debounced)")
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'message': 'Export debounced'})
+        }
+    
     try:
-        # Step 1: Fetch all data from DynamoDB
-        print("\n📊 Step 1: Fetching data from DynamoDB...")
-        dashboard_data = fetch_and_aggregate_data()
-        
-        # Step 2: Validate data quality (CI step!)
-        print("\n✅ Step 2: Validating data quality (CI)...")
-        validate_data(dashboard_data)
+        export_runs = 0
         
-        # Step 3: Push to GitHub
-        print("\n🔄 Step 3: Pushing to GitHub...")
-        push_to_github(dashboard_data)
+        while True:
+            export_runs += 1
+            dashboard_data, aggregates_stored = run_export()
+            
+            if release_export_lease():
+                break
+            
+            # Writes arrived during this export
+            if export_runs > MAX_TRAILING_EXPORTS or not has_time_for_export(context):
+                # Free the lease and fail the invocation so Lambda retries the stream batch;
+                # the retry acquires the lease and exports the remaining writes
+                abandon_export_lease()
+                raise TrailingExportPending(f"New writes still pending after {export_runs} exports")
+            
+            print("\n🔁 New log writes arrived during the export - exporting again...")
         
         print("\n" + "="*60)
         print("✅ DATA EXPORT COMPLETED SUCCESSFULLY")
@@ -64,80 +117,201 @@ def lambda_handler(event, context):
                 'stats': {
                     'total_resources': dashboard_data['overview']['total_resources'],
                     'monthly_savings': float(dashboard_data['overview']['monthly_savings']),
-                    'last_updated': dashboard_data['metadata']['last_updated']
+                    'last_updated': dashboard_data['metadata']['last_updated'],
+                    'export_runs': export_runs,
+                    'daily_aggregates_stored': aggregates_stored
                 }
             })
         }
+    
+    except TrailingExportPending:
+        raise
         
     except Exception as e:
         print(f"\n❌ ERROR: {str(e)}")
         import traceback
         traceback.print_exc()
         
+        # Let the next invocation export without waiting for the lease to expire
+        abandon_export_lease()
+        
         return {
             'statusCode': 500,
             'body': json.dumps(f'Error: {str(e)}')
         }
 
 
-def fetch_and_aggregate_data():
-    """
-    Fetch all CostGuardian data from DynamoDB and aggregate it
-    Returns formatted data structure for dashboard
-    """
-    table = dynamodb.Table(DYNAMODB_TABLE)
+class TrailingExportPending(Exception):
+    """Writes arrived during the export but this invocation has no runs/time left to export them"""
+
+
+def run_export():
+    """Fetch, validate, store and push one export; returns (dashboard_data, aggregates_stored)"""
     
-    # Scan entire table
-    print("  📥 Scanning DynamoDB table...")
-    response = table.scan()
-    items = response.get('Items', [])
+    # Step 1: Fetch all data from DynamoDB
+    print("\n📊 Step 1: Fetching data from DynamoDB...")
+    dashboard_data, daily_rollups = fetch_and_aggregate_data()
     
-    # Handle pagination if needed
-    while 'LastEvaluatedKey' in response:
-        response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-        items.extend(response.get('Items', []))
+    # Step 2: Validate data quality (CI step!)
+    print("\n✅ Step 2: Validating data quality (CI)...")
+    validate_data(dashboard_data)
     
-    print(f"  ✓ Found {len(items)} total log entries")
+    # Step 3: Store daily rollups for the dashboard API
+    print("\n🗂️  Step 3: Storing daily aggregates...")
+    aggregates_stored = store_daily_aggregates(daily_rollups)
     
-    # Aggregate data
-    print("  🔄 Aggregating data...")
+    # Step 4: Push to GitHub
+    print("\n🔄 Step 4: Pushing to GitHub...")
+    push_to_github(dashboard_data)
     
-    # Track unique resources (latest state only)
+    return dashboard_data, aggregates_stored
+
+
+def has_time_for_export(context):
+    """True if the invocation has enough time left to start another export"""
+    if context is None:
+        return True
+    return context.get_remaining_time_in_millis() >= TRAILING_EXPORT_MIN_REMAINING_MS
+
+
+def acquire_export_lease():
+    """
+    Claim the export lease with a conditional put
+    If another invocation holds it, mark it Dirty so the holder re-exports, and return False
+    Fails open (returns True) if the lease table is unavailable
+    """
+    
+    # Retry once more if the lease is released between the failed put and the update
+    for _ in range(3):
+        now = int(time.time())
+        
+        try:
+            _LEASE_TABLE.put_item(
+                Item={
+                    'LeaseId': 'data-export',
+                    'ExpiresAt': now + EXPORT_LEASE_SECONDS,
+                    'Dirty': False
+                },
+                ConditionExpression='attribute_not_exists(LeaseId) OR ExpiresAt < :now',
+                ExpressionAttributeValues={':now': now}
+            )
+            return True
+        
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                print(f"  ⚠️  Could not acquire export lease ({str(e)}) - exporting anyway")
+                return True
+        
+        try:
+            _LEASE_TABLE.update_item(
+                Key={'LeaseId': 'data-export'},
+                UpdateExpression='SET Dirty = :true',
+                ConditionExpression='attribute_exists(LeaseId) AND ExpiresAt >= :now',
+                ExpressionAttributeValues={':true': True, ':now': now}
+            )
+            return False
+        
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                print(f"  ⚠️  Could not mark export lease dirty ({str(e)}) - exporting anyway")
+                return True
+    
+    return True
+
+
+def release_export_lease():
+    """
+    Delete the lease unless a debounced invocation marked it Dirty during the export
+    Returns False if it was dirty: the flag is cleared, the lease renewed, and the caller must export again
+    """
+    
+    try:
+        _LEASE_TABLE.delete_item(
+            Key={'LeaseId': 'data-export'},
+            ConditionExpression='attribute_not_exists(Dirty) OR Dirty = :false',
+            ExpressionAttributeValues={':false': False}
+        )
+        return True
+    
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            print(f"  ⚠️  Could not release export lease ({str(e)})")
+            return True
+    
+    # Clear the flag before re-exporting; later writes will set it again
+    _LEASE_TABLE.update_item(
+        Key={'LeaseId': 'data-export'},
+        UpdateExpression='SET Dirty = :false, ExpiresAt = :expires',
+        ExpressionAttributeValues={':false': False, ':expires': int(time.time()) + EXPORT_LEASE_SECONDS}
+    )
+    return False
+
+
+def abandon_export_lease():
+    """Delete the lease unconditionally (best effort)"""
+    try:
+        _LEASE_TABLE.delete_item(Key={'LeaseId': 'data-export'})
+    except Exception as e:
+        print(f"  ⚠️  Could not release export lease ({str(e)})")
+
+
+def fetch_and_aggregate_data():
+    """
+    Fetch all CostGuardian data from DynamoDB and aggregate it
+    Returns formatted data structure for dashboard and per-day deletion rollups
+    """
+    thirty_days_ago_str = (datetime.utcnow() - timedelta(days=30)).strftime('%Y-%m-%d')
+    
+    # Scan entire table (segments read independent slices in parallel)
+    # Each page is aggregated as it arrives, so raw log entries are never accumulated
+    print(f"  📥 Scanning and aggregating DynamoDB table ({SCAN_SEGMENTS} segments)...")
+    with ThreadPoolExecutor(max_workers=SCAN_SEGMENTS) as executor:
+        futures = [
+            executor.submit(_scan_segment, segment, SCAN_SEGMENTS, thirty_days_ago_str)
+            for segment in range(SCAN_SEGMENTS)
+        ]
+        partials = [future.result() for future in futures]
+    
+    # Merge per-segment aggregates
+    total_log_entries = 0
     unique_resources = {}
-    for item in items:
-        resource_id = item.get('ResourceID')
-        timestamp = item.get('Timestamp', '')
+    daily_activity = defaultdict(lambda: {'deleted': 0, 'warned': 0, 'active': 0})
+    rollups_by_day = defaultdict(lambda: defaultdict(lambda: {'count': 0, 'monthly_savings': 0.0}))
+    
+    for partial in partials:
+        total_log_entries += partial['total_log_entries']
         
-        if resource_id not in unique_resources:
-            unique_resources[resource_id] = item
-        else:
-            # Keep most recent entry
-            if timestamp > unique_resources[resource_id].get('Timestamp', ''):
-                unique_resources[resource_id] = item
+        for item in partial['unique_resources'].values():
+            _update_unique_resources(unique_resources, item)
+        
+        for date_key, day_stats in partial['daily_activity'].items():
+            for key, value in day_stats.items():
+                daily_activity[date_key][key] += value
+        
+        for day_number, categories in partial['rollups_by_day'].items():
+            for resource_type, stats in categories.items():
+                type_stats = rollups_by_day[day_number][resource_type]
+                type_stats['count'] += stats['count']
+                type_stats['monthly_savings'] += stats['monthly_savings']
     
+    print(f"  ✓ Found {total_log_entries} total log entries")
     print(f"  ✓ Found {len(unique_resources)} unique resources")
     
-    # Calculate overview statistics
-    overview = calculate_overview(unique_resources)
-    
-    # Get resource breakdown by type
-    breakdown = calculate_breakdown(unique_resources)
+    # Overview, breakdown by type, current resources and deletion history (one pass)
+    overview, breakdown, current_resources, deleted_resources = summarize_resources(unique_resources)
     
     # Get recent activity (last 30 days)
-    activity = calculate_activity(items)
-    
-    # Get current resources being monitored
-    current_resources = get_current_resources(unique_resources)
+    activity = format_activity(daily_activity)
     
-    # Get deletion history
-    deleted_resources = get_deleted_resources(unique_resources)
+    # Get per-day deletion rollups for the dashboard API
+    daily_rollups = format_daily_rollups(rollups_by_day)
     
     # Create dashboard data structure
     dashboard_data = {
         'metadata': {
             'last_updated': datetime.utcnow().isoformat() + 'Z',
             'version': '1.0',
-            'total_log_entries': len(items),
+            'total_log_entries': total_log_entries,
             'unique_resources': len(unique_resources)
         },
         'overview': overview,
@@ -149,177 +323,273 @@ def fetch_and_aggregate_data():
     
     print("  ✓ Data aggregation complete")
     
-    return dashboard_data
+    return dashboard_data, daily_rollups
+
+
+def _scan_segment(segment, total_segments, thirty_days_ago_str):
+    """
+    Scan one segment of the table, following pagination until exhausted
+    Items are folded into this segment's partial aggregates page by page
+    Runs on a worker thread, so it calls the thread-safe client behind the resource
+    (dynamodb.meta.client), which already deserializes items to plain Python values
+    """
+    
+    client = dynamodb.meta.client
+    
+    scan_kwargs = {
+        'TableName': DYNAMODB_TABLE,
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        # Only the attributes the aggregation reads
+        'ProjectionExpression': 'ResourceID, #ts, #status, ResourceType, MonthlyCost, #region, BackupLocation, EstimatedMonthlySavings',
+        'ExpressionAttributeNames': {
+            '#ts': 'Timestamp',
+            '#status': 'Status',
+            '#region': 'Region'
+        }
+    }
+    
+    total_log_entries = 0
+    unique_resources = {}
+    daily_activity = defaultdict(lambda: {'deleted': 0, 'warned': 0, 'active': 0})
+    rollups_by_day = defaultdict(lambda: defaultdict(lambda: {'count': 0, 'monthly_savings': 0.0}))
+    
+    while True:
+        response = client.scan(**scan_kwargs)
+        
+        for item in response.get('Items', []):
+            total_log_entries += 1
+            _update_unique_resources(unique_resources, item)
+            _update_activity(daily_activity, item, thirty_days_ago_str)
+            _update_daily_rollups(rollups_by_day, item)
+        
+        # Handle pagination if needed
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    return {
+        'total_log_entries': total_log_entries,
+        'unique_resources': unique_resources,
+        'daily_activity': daily_activity,
+        'rollups_by_day': rollups_by_day
+    }
+
+
+def _update_unique_resources(unique_resources, item):
+    """Track unique resources (latest state only)"""
+    
+    resource_id = item.get('ResourceID')
+    timestamp = item.get('Timestamp', '')
+    
+    if resource_id not in unique_resources:
+        unique_resources[resource_id] = item
+    else:
+        # Keep most recent entry
+        if timestamp > unique_resources[resource_id].get('Timestamp', ''):
+            unique_resources[resource_id] = item
 
 
-def calculate_overview(unique_resources):
-    """Calculate high-level overview statistics"""
+def summarize_resources(unique_resources):
+    """
+    Build overview statistics, savings breakdown by type, currently monitored
+    resources and deletion history in a single pass over unique_resources
+    """
     
-    total_resources = len(unique_resources)
     deleted_count = 0
     idle_count = 0
     active_count = 0
     total_monthly_savings = 0.0
+    breakdown = defaultdict(lambda: {
+        'count': 0,
+        'deleted': 0,
+        'idle': 0,
+        'active': 0,
+        'monthly_savings': 0.0
+    })
+    current = []
+    deleted = []
     
     for resource_id, resource in unique_resources.items():
         status = resource.get('Status', 'Unknown')
+        resource_type = resource.get('ResourceType', 'Unknown')
         monthly_cost = float(resource.get('MonthlyCost', 0))
+        bucket = _STATUS_BUCKET.get(status)
+        
+        type_stats = breakdown[resource_type]
+        type_stats['count'] += 1
         
-        if status in ['Deleted', 'Released', 'Terminated']:
+        if bucket == 'deleted':
             deleted_count += 1
             total_monthly_savings += monthly_cost
-        elif status in ['Idle-Warning', 'Idle', 'Quarantine', 'Stopped', 'Available', 'Unattached', 'Empty']:
+            type_stats['deleted'] += 1
+            type_stats['monthly_savings'] += monthly_cost
+            
+            deleted.append({
+                'resource_id': resource_id,
+                'resource_type': resource_type,
+                'status': status,
+                'monthly_savings': monthly_cost,
+                'deleted_at': resource.get('Timestamp', ''),
+                'backup_location': resource.get('BackupLocation', 'N/A')
+            })
+            continue
+        
+        if bucket == 'idle':
             idle_count += 1
-        elif status == 'Active':
+            type_stats['idle'] += 1
+        elif bucket == 'active':
             active_count += 1
+            type_stats['active'] += 1
+        
+        current.append({
+            'resource_id': resource_id,
+            'resource_type': resource_type,
+            'status': status,
+            'monthly_cost': monthly_cost,
+            'last_checked': resource.get('Timestamp', ''),
+            'region': resource.get('Region', 'us-east-1')
+        })
     
-    return {
-        'total_resources': total_resources,
+    overview = {
+        'total_resources': len(unique_resources),
         'resources_deleted': deleted_count,
         'idle_resources': idle_count,
         'active_resources': active_count,
         'monthly_savings': round(total_monthly_savings, 2),
         'annual_savings': round(total_monthly_savings * 12, 2)
     }
-
-
-def calculate_breakdown(unique_resources):
-    """Calculate savings breakdown by resource type"""
-    
-    breakdown = {}
-    
-    for resource_id, resource in unique_resources.items():
-        resource_type = resource.get('ResourceType', 'Unknown')
-        status = resource.get('Status', 'Unknown')
-        monthly_cost = float(resource.get('MonthlyCost', 0))
-        
-        if resource_type not in breakdown:
-            breakdown[resource_type] = {
-                'count': 0,
-                'deleted': 0,
-                'idle': 0,
-                'active': 0,
-                'monthly_savings': 0.0
-            }
-        
-        breakdown[resource_type]['count'] += 1
-        
-        if status in ['Deleted', 'Released', 'Terminated']:
-            breakdown[resource_type]['deleted'] += 1
-            breakdown[resource_type]['monthly_savings'] += monthly_cost
-        elif status in ['Idle-Warning', 'Idle', 'Quarantine', 'Stopped', 'Available', 'Unattached', 'Empty']:
-            breakdown[resource_type]['idle'] += 1
-        elif status == 'Active':
-            breakdown[resource_type]['active'] += 1
     
     # Round savings
-    for resource_type in breakdown:
-        breakdown[resource_type]['monthly_savings'] = round(breakdown[resource_type]['monthly_savings'], 2)
+    for type_stats in breakdown.values():
+        type_stats['monthly_savings'] = round(type_stats['monthly_savings'], 2)
+    
+    # Current: highest monthly cost first; deleted: most recent first
+    current.sort(key=lambda x: x['monthly_cost'], reverse=True)
+    deleted.sort(key=lambda x: x['deleted_at'], reverse=True)
     
-    return breakdown
+    return overview, dict(breakdown), current, deleted
 
 
-def calculate_activity(items):
-    """Calculate activity timeline for last 30 days"""
+def _update_activity(daily_activity, item, thirty_days_ago_str):
+    """Count one log entry into the activity timeline if it is within the last 30 days"""
     
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    timestamp_str = item.get('Timestamp', '')
+    if not isinstance(timestamp_str, str):
+        return
     
-    # Group by date
-    daily_activity = {}
+    # ISO timestamps start with YYYY-MM-DD, which also compares correctly as a string
+    date_key = timestamp_str[:10]
     
-    for item in items:
-        timestamp_str = item.get('Timestamp', '')
-        
-        # Parse timestamp
-        try:
-            if 'T' in timestamp_str:
-                timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-            else:
-                timestamp = datetime.strptime(timestamp_str[:10], '%Y-%m-%d')
-        except:
-            continue
-        
-        # Skip if older than 30 days
-        if timestamp < thirty_days_ago:
-            continue
-        
-        date_key = timestamp.strftime('%Y-%m-%d')
-        
-        if date_key not in daily_activity:
-            daily_activity[date_key] = {
-                'date': date_key,
-                'deleted': 0,
-                'warned': 0,
-                'active': 0
-            }
-        
-        status = item.get('Status', '')
-        
-        if status in ['Deleted', 'Released', 'Terminated']:
-            daily_activity[date_key]['deleted'] += 1
-        elif status in ['Idle-Warning', 'Idle', 'Quarantine']:
-            daily_activity[date_key]['warned'] += 1
-        elif status == 'Active':
-            daily_activity[date_key]['active'] += 1
+    # Skip if missing or older than 30 days
+    if not date_key or date_key < thirty_days_ago_str:
+        return
+    
+    day_stats = daily_activity[date_key]
     
-    # Convert to sorted list
-    activity_list = sorted(daily_activity.values(), key=lambda x: x['date'])
+    status = item.get('Status', '')
     
-    return activity_list
+    if status in _DELETED:
+        day_stats['deleted'] += 1
+    elif status in _WARNED:
+        day_stats['warned'] += 1
+    elif status == 'Active':
+        day_stats['active'] += 1
 
 
-def get_current_resources(unique_resources):
-    """Get list of currently monitored resources with latest status"""
+def format_activity(daily_activity):
+    """Convert the per-date activity counts to a list sorted by date"""
     
-    current = []
+    return [
+        {'date': date_key, **daily_activity[date_key]}
+        for date_key in sorted(daily_activity)
+    ]
+
+
+def _update_daily_rollups(rollups_by_day, item):
+    """
+    Count one DELETED log entry into its (UTC) day and resource type
+    Buckets by integer day number; date strings are built once per day in format_daily_rollups
+    """
     
-    for resource_id, resource in unique_resources.items():
-        status = resource.get('Status', 'Unknown')
-        
-        # Skip deleted resources
-        if status in ['Deleted', 'Released', 'Terminated']:
-            continue
-        
-        current.append({
-            'resource_id': resource_id,
-            'resource_type': resource.get('ResourceType', 'Unknown'),
-            'status': status,
-            'monthly_cost': float(resource.get('MonthlyCost', 0)),
-            'last_checked': resource.get('Timestamp', ''),
-            'region': resource.get('Region', 'us-east-1')
-        })
+    if item.get('Status') != 'DELETED':
+        return
     
-    # Sort by monthly cost (highest first)
-    current.sort(key=lambda x: x['monthly_cost'], reverse=True)
+    try:
+        timestamp = float(item.get('Timestamp', 0))
+        monthly_savings = float(item.get('EstimatedMonthlySavings', 0))
+    except (TypeError, ValueError):
+        return
+    
+    day_number = int(timestamp // 86400)
+    resource_type = item.get('ResourceType', 'Unknown')
     
-    return current
+    type_stats = rollups_by_day[day_number][resource_type]
+    type_stats['count'] += 1
+    type_stats['monthly_savings'] += monthly_savings
 
 
-def get_deleted_resources(unique_resources):
-    """Get list of deleted resources with savings info"""
+def format_daily_rollups(rollups_by_day):
+    """Returns {date_str: {resource_type: {count, monthly_savings}}}"""
     
-    deleted = []
+    epoch = date(1970, 1, 1)
     
-    for resource_id, resource in unique_resources.items():
-        status = resource.get('Status', 'Unknown')
+    return {
+        (epoch + timedelta(days=day_number)).isoformat(): dict(categories)
+        for day_number, categories in rollups_by_day.items()
+    }
+
+
+def store_daily_aggregates(daily_rollups):
+    """
+    Upsert one row per day into the daily aggregates table (keyed by Date)
+    Returns False on failure; the failure is logged and sent as the CostGuardian
+    DailyAggregatesWriteFailures metric, but does not stop the GitHub export
+    """
+    
+    try:
+        updated_at = datetime.utcnow().isoformat() + 'Z'
         
-        # Only include deleted resources
-        if status not in ['Deleted', 'Released', 'Terminated']:
-            continue
+        with _AGGREGATES_TABLE.batch_writer(overwrite_by_pkeys=['Date']) as batch:
+            for date_key, categories in daily_rollups.items():
+                batch.put_item(Item={
+                    'Date': date_key,
+                    'Categories': {
+                        resource_type: {
+                            'count': stats['count'],
+                            'monthly_savings': Decimal(str(round(stats['monthly_savings'], 2)))
+                        }
+                        for resource_type, stats in categories.items()
+                    },
+                    'UpdatedAt': updated_at
+                })
         
-        deleted.append({
-            'resource_id': resource_id,
-            'resource_type': resource.get('ResourceType', 'Unknown'),
-            'status': status,
-            'monthly_savings': float(resource.get('MonthlyCost', 0)),
-            'deleted_at': resource.get('Timestamp', ''),
-            'backup_location': resource.get('BackupLocation', 'N/A')
-        })
-    
-    # Sort by deletion date (most recent first)
-    deleted.sort(key=lambda x: x['deleted_at'], reverse=True)
+        print(f"  ✓ Stored rollups for {len(daily_rollups)} days in {DAILY_AGGREGATES_TABLE}")
+        return True
     
-    return deleted
+    except Exception as e:
+        print(f"  ⚠️  Failed to store daily aggregates: {str(e)}")
+        send_cloudwatch_metric('DailyAggregatesWriteFailures', 1)
+        return False
+
+
+def send_cloudwatch_metric(metric_name, value, unit='Count'):
+    """Sends a custom metric to the CostGuardian CloudWatch namespace"""
+    try:
+        cloudwatch.put_metric_data(
+            Namespace='CostGuardian',
+            MetricData=[
+                {
+                    'MetricName': metric_name,
+                    'Value': value,
+                    'Unit': unit,
+                    'Timestamp': datetime.now()
+                }
+            ]
+        )
+        print(f"  📊 Sent metric: {metric_name} = {value}")
+    except Exception as e:
+        print(f"  ⚠️  Failed to send metric {metric_name}: {str(e)}")
 
 
 def validate_data(data):
@@ -350,7 +620,7 @@ def validate_data(data):
     
     # Validate JSON serializable
     try:
-        json.dumps(data, cls=DecimalEncoder)
+        dumps_json_bytes(data)
     except Exception as e:
         raise ValueError(f"Data is not JSON serializable: {str(e)}")
     
@@ -361,7 +631,7 @@ def validate_data(data):
 
 def push_to_github(data):
     """
-    Push data.json to GitHub repository using urllib (no external dependencies!)
+    Push data.json to GitHub repository using urllib3 (no external dependencies!)
     Uses GitHub API to commit file
     """
     
@@ -377,37 +647,44 @@ def push_to_github(data):
     # GitHub API endpoint
     api_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{DATA_FILE_PATH}"
     
-    # Convert data to JSON
-    json_content = json.dumps(data, indent=2, cls=DecimalEncoder)
-    
-    # Encode to base64 (GitHub API requirement)
-    content_base64 = base64.b64encode(json_content.encode('utf-8')).decode('utf-8')
-    
     # Check if file exists (to get SHA)
     file_sha = None
-    try:
-        print("  🔍 Checking if file exists...")
-        
-        # Create request to check file
-        req = urllib.request.Request(
-            f"{api_url}?ref={GITHUB_BRANCH}",
-            headers={
-                'Authorization': f'token {GITHUB_TOKEN}',
-                'Accept': 'application/vnd.github.v3+json'
-            }
-        )
-        
-        with urllib.request.urlopen(req) as response:
-            if response.status == 200:
-                response_data = json.loads(response.read().decode('utf-8'))
-                file_sha = response_data['sha']
-                print(f"  ✓ File exists (SHA: {file_sha[:8]}...)")
-    
-    except urllib.error.HTTPError as e:
-        if e.code == 404:
-            print("  ℹ️  File doesn't exist yet (will create)")
-        else:
-            print(f"  ⚠️  Error checking file: {e.code} {e.reason}")
+    existing_last_updated = None
+    
+    print("  🔍 Checking if file exists...")
+    
+    response = _HTTP.request(
+        'GET',
+        f"{api_url}?ref={GITHUB_BRANCH}",
+        headers={
+            'Authorization': f'token {GITHUB_TOKEN}',
+            'Accept': 'application/vnd.github.v3+json'
+        }
+    )
+    
+    if response.status == 200:
+        response_data = json.loads(response.data.decode('utf-8'))
+        file_sha = response_data['sha']
+        existing_last_updated = get_existing_last_updated(response_data)
+        print(f"  ✓ File exists (SHA: {file_sha[:8]}...)")
+    elif response.status == 404:
+        print("  ℹ️  File doesn't exist yet (will create)")
+    else:
+        print(f"  ⚠️  Error checking file: {response.status} {response.reason}")
+    
+    # Skip the commit if only last_updated would change: stamp the data with the
+    # existing file's last_updated and compare Git blob SHAs
+    if file_sha and existing_last_updated:
+        unchanged_data = {**data, 'metadata': {**data['metadata'], 'last_updated': existing_last_updated}}
+        if git_blob_sha(dumps_json_bytes(unchanged_data)) == file_sha:
+            print("  ✓ Data unchanged since last export - skipping PUT")
+            return
+    
+    # Convert data to compact JSON bytes and base64 them (GitHub API requirement),
+    # dropping each intermediate copy as soon as it is no longer needed
+    raw_content = dumps_json_bytes(data)
+    content_base64 = base64.b64encode(raw_content).decode('ascii')
+    del raw_content
     
     # Prepare commit payload
     payload = {
@@ -420,47 +697,68 @@ def push_to_github(data):
     if file_sha:
         payload['sha'] = file_sha
     
+    request_body = dumps_json_bytes(payload)
+    del payload, content_base64
+    
     # Push to GitHub
     try:
         print("  📤 Pushing to GitHub...")
         
-        req = urllib.request.Request(
+        response = _HTTP.request(
+            'PUT',
             api_url,
-            data=json.dumps(payload).encode('utf-8'),
+            body=request_body,
             headers={
                 'Authorization': f'token {GITHUB_TOKEN}',
                 'Accept': 'application/vnd.github.v3+json',
                 'Content-Type': 'application/json'
-            },
-            method='PUT'
+            }
         )
         
-        with urllib.request.urlopen(req) as response:
-            if response.status in [200, 201]:
-                print("  ✅ Successfully pushed to GitHub!")
-                response_data = json.loads(response.read().decode('utf-8'))
-                commit_sha = response_data['commit']['sha']
-                commit_url = response_data['commit']['html_url']
-                print(f"     Commit SHA: {commit_sha[:8]}...")
-                print(f"     Commit URL: {commit_url}")
-            else:
-                print(f"  ❌ GitHub API error: {response.status}")
-                raise Exception(f"GitHub API returned {response.status}")
-    
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode('utf-8')
-        print(f"  ❌ GitHub API error: {e.code} {e.reason}")
-        print(f"     Response: {error_body}")
-        raise Exception(f"GitHub API returned {e.code}: {error_body}")
+        if response.status in [200, 201]:
+            print("  ✅ Successfully pushed to GitHub!")
+            response_data = json.loads(response.data.decode('utf-8'))
+            commit_sha = response_data['commit']['sha']
+            commit_url = response_data['commit']['html_url']
+            print(f"     Commit SHA: {commit_sha[:8]}...")
+            print(f"     Commit URL: {commit_url}")
+        else:
+            error_body = response.data.decode('utf-8')
+            print(f"  ❌ GitHub API error: {response.status} {response.reason}")
+            print(f"     Response: {error_body}")
+            raise Exception(f"GitHub API returned {response.status}: {error_body}")
     
     except Exception as e:
         print(f"  ❌ Failed to push to GitHub: {str(e)}")
         raise
 
 
-class DecimalEncoder(json.JSONEncoder):
+def git_blob_sha(content):
+    """SHA-1 Git (and the GitHub contents API) assigns to a file with these bytes"""
+    return hashlib.sha1(f"blob {len(content)}\0".encode('utf-8') + content).hexdigest()
+
+
+def get_existing_last_updated(file_data):
+    """
+    Read metadata.last_updated from a GitHub contents API file response
+    Returns None if the content is not included (files over 1 MB) or not parseable
+    """
+    try:
+        existing = json.loads(base64.b64decode(file_data.get('content', '')).decode('utf-8'))
+        return existing['metadata']['last_updated']
+    except Exception:
+        return None
+
+
+def _decimal_default(obj):
     """Helper to encode Decimal objects from DynamoDB"""
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
\ No newline at end of file
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json_bytes(data):
+    """Serialize to compact UTF-8 JSON bytes with orjson when available, else the json module"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_decimal_default)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=_decimal_default).encode('utf-8')
\ No newline at end of file